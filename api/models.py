@@ -1,43 +1,57 @@
-from pydantic import BaseModel, Field, validator
+import msgspec
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import List, Dict, Any, Optional
 
 
 class QueryRequest(BaseModel):
     """Request model for query endpoint."""
+    # Whitespace stripping happens in pydantic-core before validation
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     query: str = Field(..., description="The user's question", min_length=1)
     top_k: Optional[int] = Field(5, description="Number of context documents to retrieve", ge=1, le=20)
     temperature: Optional[float] = Field(0.7, description="LLM temperature for response generation", ge=0.0, le=2.0)
 
-    @validator('query')
-    def query_not_empty(cls, v):
-        if not v.strip():
+    @field_validator('query')
+    @classmethod
+    def query_not_empty(cls, v: str) -> str:
+        if not v:
             raise ValueError('Query cannot be empty or only whitespace')
-        return v.strip()
+        return v
+
 
+class Source(msgspec.Struct):
+    """Model for a source document.
 
-class Source(BaseModel):
-    """Model for a source document."""
-    content: str = Field(..., description="The content of the source document")
-    metadata: Dict[str, Any] = Field(default_factory=dict, description="Metadata associated with the source")
-    score: float = Field(..., description="Similarity score", ge=0.0, le=1.0)
+    Only ever constructed server-side from trusted vector-store data, so it
+    is a msgspec.Struct rather than a pydantic model: instantiation and JSON
+    encoding skip the per-field validation tax paid on every retrieved chunk.
+    """
+    content: str
+    metadata: Dict[str, Any]
+    score: float
 
 
-class QueryResponse(BaseModel):
-    """Response model for query endpoint."""
-    response: str = Field(..., description="The generated response")
-    sources: List[Source] = Field(default_factory=list, description="Source documents used for the response")
+class QueryResponse(msgspec.Struct):
+    """Response model for query endpoint (encoded with msgspec)."""
+    response: str
+    sources: List[Source] = []
 
 
 class DocumentInput(BaseModel):
     """Model for a single document to be indexed."""
+    # Whitespace stripping happens in pydantic-core before validation
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     content: str = Field(..., description="The document content", min_length=1)
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Metadata for the document")
 
-    @validator('content')
-    def content_not_empty(cls, v):
-        if not v.strip():
+    @field_validator('content')
+    @classmethod
+    def content_not_empty(cls, v: str) -> str:
+        if not v:
             raise ValueError('Document content cannot be empty or only whitespace')
-        return v.strip()
+        return v
 
 
 class IndexRequest(BaseModel):
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-import traceback
+from fastapi import APIRouter, HTTPException, status, Depends, Response
+from sse_starlette.sse import EventSourceResponse
+import asyncio
+import msgspec
 import time
 import logging
 
@@ -19,11 +21,42 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(prefix="/api")
 
+
+class MsgspecJSONResponse(Response):
+    """JSON response rendered with msgspec for msgspec.Struct payloads."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return msgspec.json.encode(content)
+
 # Service instances (will be initialized in main.py)
 embedding_service: EmbeddingService = None
 vector_db_service: VectorDBService = None
 llm_service: LLMService = None
 
+# Cached health-check result so load-balancer probes don't trigger paid
+# OpenAI/Pinecone calls on every request
+_HEALTH_CACHE_TTL_SECONDS = 30.0
+_health_cache = {"ts": 0.0, "result": None}
+
+# Cached Pinecone index stats shared by /stats and /health, so neither
+# endpoint pays a network round-trip on every call
+_STATS_CACHE_TTL_SECONDS = 10.0
+_stats_cache = {"ts": 0.0, "value": None}
+
+# Chunks per embed+upsert pipeline batch and max batches in flight
+_INDEX_BATCH_SIZE = 96
+_INDEX_MAX_CONCURRENCY = 5
+
+
+async def _get_cached_stats(vector_db_svc: VectorDBService) -> dict:
+    """Return index stats, refreshing the short-TTL cache when stale."""
+    now = time.time()
+    if _stats_cache["value"] is None or now - _stats_cache["ts"] > _STATS_CACHE_TTL_SECONDS:
+        _stats_cache["value"] = await asyncio.to_thread(vector_db_svc.get_stats)
+        _stats_cache["ts"] = now
+    return _stats_cache["value"]
+
 
 def get_embedding_service() -> EmbeddingService:
     """Dependency to get embedding service."""
@@ -57,7 +90,7 @@ def get_llm_service() -> LLMService:
 
 @router.post(
     "/query",
-    response_model=QueryResponse,
+    response_class=MsgspecJSONResponse,
     status_code=status.HTTP_200_OK,
     summary="Query the RAG system",
     description="Submit a query and receive an AI-generated response based on relevant context from the vector database"
@@ -80,18 +113,19 @@ async def query(
     try:
         # Step 1: Generate query embedding
         embedding_start = time.time()
-        query_embedding = embedding_svc.generate_embedding(request.query)
+        query_embedding = await embedding_svc.generate_embedding(request.query)
         embedding_time = time.time() - embedding_start
-        logging.info(f"** Embedding time: {embedding_time:.2f}s")
+        logger.info("** Embedding time: %.2fs", embedding_time)
 
         # Step 2: Search vector database
         search_start = time.time()
-        search_results = vector_db_svc.search(
+        search_results = await asyncio.to_thread(
+            vector_db_svc.search,
             query_embedding=query_embedding,
             top_k=request.top_k
         )
         search_time = time.time() - search_start
-        logger.info(f"** Search time: {search_time:.2f}s")
+        logger.info("** Search time: %.2fs", search_time)
         # logger.info(f"Query results:\n{search_results}")
 
         # Step 3: Format context
@@ -100,15 +134,17 @@ async def query(
 
         # Step 4: Generate response
         llm_start = time.time()
-        response_text = llm_svc.generate_response(
+        response_text = await llm_svc.generate_response(
             query=request.query,
             context=context,
-            temperature=request.temperature
+            temperature=request.temperature,
+            query_embedding=query_embedding
         )
         llm_time = time.time() - llm_start
-        logger.info(f"** LLM time: {llm_time:.2f}s")
+        logger.info("** LLM time: %.2fs", llm_time)
 
-        # Format sources for response
+        # Format sources for response; search results come from the trusted
+        # vector-store layer, so the msgspec structs skip validation entirely
         sources = [
             Source(
                 content=result["content"],
@@ -118,19 +154,84 @@ async def query(
             for result in search_results
         ]
 
-        return QueryResponse(
+        return MsgspecJSONResponse(QueryResponse(
             response=response_text,
             sources=sources
+        ))
+
+    except Exception as e:
+        logger.exception("Error processing query")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process query: {str(e)}"
         )
 
+
+@router.post(
+    "/query/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Query the RAG system with a streamed response",
+    description="Submit a query and receive the AI-generated response as Server-Sent Events, token by token, followed by a final event carrying the sources"
+)
+async def query_stream(
+    request: QueryRequest,
+    embedding_svc: EmbeddingService = Depends(get_embedding_service),
+    vector_db_svc: VectorDBService = Depends(get_vector_db_service),
+    llm_svc: LLMService = Depends(get_llm_service)
+):
+    """
+    Process a user query using the RAG pipeline, streaming the response.
+
+    Retrieval runs up front as in /query; the LLM response is then
+    streamed as SSE "token" events, followed by a "sources" event with
+    the retrieved documents and a terminating "done" event.
+    """
+    try:
+        query_embedding = await embedding_svc.generate_embedding(request.query)
+
+        search_results = await asyncio.to_thread(
+            vector_db_svc.search,
+            query_embedding=query_embedding,
+            top_k=request.top_k
+        )
+
+        context = format_context(search_results)
+
     except Exception as e:
-        print(f"Error processing query: {e}")
-        traceback.print_exc()
+        logger.exception("Error processing streaming query")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process query: {str(e)}"
         )
 
+    async def event_generator():
+        try:
+            async for token in llm_svc.generate_response_stream(
+                query=request.query,
+                context=context,
+                temperature=request.temperature
+            ):
+                yield {"event": "token", "data": token}
+
+            yield {
+                "event": "sources",
+                "data": msgspec.json.encode([
+                    Source(
+                        content=result["content"],
+                        metadata=result["metadata"],
+                        score=result["score"]
+                    )
+                    for result in search_results
+                ]).decode()
+            }
+            yield {"event": "done", "data": ""}
+
+        except Exception as e:
+            logger.exception("Error streaming response")
+            yield {"event": "error", "data": str(e)}
+
+    return EventSourceResponse(event_generator())
+
 
 @router.post(
     "/index",
@@ -149,13 +250,16 @@ async def index_documents(
 
     Steps:
     1. Chunk documents if needed
-    2. Generate embeddings for all chunks
-    3. Upsert to vector database
+    2. Split chunks into batches and, for each batch concurrently,
+       generate embeddings then upsert to the vector database
     """
     try:
-        # Prepare documents (chunking and metadata)
-        contents = [doc.content for doc in request.documents]
-        metadatas = [doc.metadata for doc in request.documents]
+        # Prepare documents (chunking and metadata) in a single pass
+        contents = []
+        metadatas = []
+        for doc in request.documents:
+            contents.append(doc.content)
+            metadatas.append(doc.metadata)
 
         prepared_docs = prepare_documents_for_indexing(
             contents=contents,
@@ -164,21 +268,38 @@ async def index_documents(
             overlap=settings.chunk_overlap
         )
 
-        # Generate embeddings for all chunks
-        texts_to_embed = [doc["content"] for doc in prepared_docs]
-        embeddings = embedding_svc.generate_embeddings_batch(texts_to_embed)
-
-        # Prepare documents with embeddings for Pinecone
-        documents_with_embeddings = []
-        for doc, embedding in zip(prepared_docs, embeddings):
-            documents_with_embeddings.append({
-                "id": doc["id"],
-                "embedding": embedding,
-                "metadata": doc["metadata"]
-            })
+        # Smart batching: sort chunks by length so each embedding call
+        # carries similarly sized inputs and wastes less padding
+        prepared_docs.sort(key=lambda doc: len(doc["content"]))
 
-        # Upsert to vector database
-        indexed_count = vector_db_svc.upsert_documents(documents_with_embeddings)
+        batches = [
+            prepared_docs[i:i + _INDEX_BATCH_SIZE]
+            for i in range(0, len(prepared_docs), _INDEX_BATCH_SIZE)
+        ]
+        semaphore = asyncio.Semaphore(_INDEX_MAX_CONCURRENCY)
+
+        async def process_batch(batch):
+            """Embed one batch of chunks and upsert it as soon as it's ready."""
+            async with semaphore:
+                embeddings = await embedding_svc.generate_embeddings_batch(
+                    [doc["content"] for doc in batch]
+                )
+                documents_with_embeddings = [
+                    {
+                        "id": doc["id"],
+                        "embedding": embedding,
+                        "metadata": doc["metadata"]
+                    }
+                    for doc, embedding in zip(batch, embeddings)
+                ]
+                return await asyncio.to_thread(
+                    vector_db_svc.upsert_documents, documents_with_embeddings
+                )
+
+        batch_counts = await asyncio.gather(*[
+            process_batch(batch) for batch in batches
+        ])
+        indexed_count = sum(batch_counts)
 
         return IndexResponse(
             indexed_count=indexed_count,
@@ -186,8 +307,7 @@ async def index_documents(
         )
 
     except Exception as e:
-        print(f"Error indexing documents: {e}")
-        traceback.print_exc()
+        logger.exception("Error indexing documents")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to index documents: {str(e)}"
@@ -204,13 +324,22 @@ async def index_documents(
 async def health_check():
     """
     Check the health of the API and external services.
+
+    Results are cached for a short TTL so frequent load-balancer probes
+    don't hit OpenAI and Pinecone on every invocation.
     """
+    if (
+        _health_cache["result"] is not None
+        and time.time() - _health_cache["ts"] < _HEALTH_CACHE_TTL_SECONDS
+    ):
+        return _health_cache["result"]
+
     services = {}
 
     # Check Pinecone
     try:
         if vector_db_service and vector_db_service.index:
-            stats = vector_db_service.get_stats()
+            stats = await _get_cached_stats(vector_db_service)
             services["pinecone"] = ServiceStatus(
                 status="healthy",
                 message=f"Connected. Vectors: {stats['total_vector_count']}"
@@ -230,7 +359,7 @@ async def health_check():
     try:
         if embedding_service:
             # Try a simple embedding test
-            embedding_service.generate_embedding("test")
+            await embedding_service.generate_embedding("test")
             services["openai_embeddings"] = ServiceStatus(
                 status="healthy",
                 message="API responding"
@@ -269,10 +398,14 @@ async def health_check():
         s.status == "healthy" for s in services.values()
     ) else "degraded"
 
-    return HealthResponse(
+    result = HealthResponse(
         status=overall_status,
         services=services
     )
+    _health_cache["result"] = result
+    _health_cache["ts"] = time.time()
+
+    return result
 
 
 @router.get(
@@ -285,10 +418,10 @@ async def get_stats(
 ):
     """Get vector database statistics."""
     try:
-        stats = vector_db_svc.get_stats()
+        stats = await _get_cached_stats(vector_db_svc)
         return stats
     except Exception as e:
-        print(f"Error getting stats: {e}")
+        logger.exception("Error getting stats")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get stats: {str(e)}"
@@ -0,0 +1,15 @@
+import httpx
+
+# One connection pool shared by every OpenAI client in the application, so
+# TLS handshakes and keepalive connections are amortized across services
+# instead of each service maintaining its own pool.
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=30.0
+)
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client's connection pool (call at shutdown)."""
+    await http_client.aclose()
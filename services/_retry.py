@@ -0,0 +1,25 @@
+import openai
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+# Only transient OpenAI failures are worth retrying; auth and validation
+# errors fail fast instead of burning retry attempts
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+)
+
+# Jittered exponential backoff avoids a thundering herd when the upstream
+# API recovers, and tenacity sleeps with asyncio.sleep on coroutines so
+# waiting never blocks the event loop
+retry_openai = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_random_exponential(min=1, max=10),
+    retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+    reraise=True
+)
@@ -1,90 +1,174 @@
-import time
+import asyncio
+from collections import OrderedDict
 from typing import List
-from openai import OpenAI
+
+import numpy as np
+from openai import AsyncOpenAI
 from config.settings import settings
+from services._http import http_client
+from services._retry import retry_openai
 
 
 class EmbeddingService:
     """Service for generating text embeddings using OpenAI API."""
 
+    # Max texts per embeddings.create call and max concurrent in-flight calls
+    batch_size: int = 256
+    max_concurrency: int = 5
+
+    # Token budget per embeddings.create call, kept under OpenAI's 300k
+    # per-request limit with headroom for estimation error
+    max_batch_tokens: int = 250_000
+
+    # Max cached single-text embeddings; repeated queries (health probes,
+    # common questions) resolve without an API call
+    cache_size: int = 1024
+
     def __init__(self):
         """Initialize the OpenAI client."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=http_client
+        )
         self.model = settings.embedding_model
         self.dimension = settings.embedding_dimension
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # LRU of text -> embedding; valid for the lifetime of this instance
+        # since model and dimension are fixed at construction
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
 
-    def generate_embedding(
-        self,
-        text: str,
-        max_retries: int = 3,
-        retry_delay: float = 1.0
-    ) -> List[float]:
+    async def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding for a given text.
 
+        Results are served from a bounded in-process LRU cache when the
+        exact text has been embedded before. Transient API errors (rate
+        limits, connection failures, timeouts) are retried with jittered
+        exponential backoff.
+
         Args:
             text: The text to generate embedding for
-            max_retries: Maximum number of retry attempts
-            retry_delay: Initial delay between retries (exponential backoff)
 
         Returns:
-            List of floats representing the embedding vector
+            L2-normalized float32 array of shape (dimension,)
 
         Raises:
-            Exception: If all retry attempts fail
+            openai.OpenAIError: If the request fails after all retries
+        """
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            return cached
+
+        embedding = await self._fetch_embedding(text)
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.popitem(last=False)
+        self._cache[text] = embedding
+
+        return embedding
+
+    async def warm_cache(self, texts: List[str]) -> None:
         """
-        for attempt in range(max_retries):
-            try:
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=text,
-                    dimensions=self.dimension
-                )
-                return response.data[0].embedding
-
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    print(f"Embedding API error (attempt {attempt + 1}/{max_retries}): {e}")
-                    print(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    raise Exception(f"Failed to generate embedding after {max_retries} attempts: {e}")
-
-    def generate_embeddings_batch(
-        self,
-        texts: List[str],
-        max_retries: int = 3,
-        retry_delay: float = 1.0
-    ) -> List[List[float]]:
+        Seed the embedding cache with common texts.
+
+        Called at startup so health probes and frequent short queries are
+        served from the cache from the first request onward.
+
+        Args:
+            texts: Texts to embed and cache
+        """
+        embeddings = await self.generate_embeddings_batch(texts)
+        for text, embedding in zip(texts, embeddings):
+            if len(self._cache) >= self.cache_size:
+                break
+            self._cache[text] = embedding
+
+    @retry_openai
+    async def _fetch_embedding(self, text: str) -> np.ndarray:
+        """Fetch a single embedding from the API with retry."""
+        response = await self.client.embeddings.create(
+            model=self.model,
+            input=text,
+            dimensions=self.dimension
+        )
+        return self._to_array([response.data[0].embedding])[0]
+
+    async def generate_embeddings_batch(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for multiple texts in batch.
 
+        Inputs are sorted by estimated token count and greedily packed into
+        batches that stay within OpenAI's per-request token and input-count
+        limits, so large ingestion jobs don't fail with 400s and each batch
+        carries similarly sized texts. Batches are embedded concurrently;
+        the semaphore bounds in-flight requests to avoid rate limits.
+
         Args:
             texts: List of texts to generate embeddings for
-            max_retries: Maximum number of retry attempts
-            retry_delay: Initial delay between retries (exponential backoff)
 
         Returns:
-            List of embedding vectors
+            L2-normalized float32 array of shape (len(texts), dimension),
+            rows in the same order as the input texts
 
         Raises:
-            Exception: If all retry attempts fail
+            openai.OpenAIError: If a batch request fails after all retries
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        # Cheap ~4-characters-per-token estimate; accurate enough for packing
+        token_counts = [max(1, len(text) // 4) for text in texts]
+
+        # Pack indices sorted by size into token- and count-bounded batches
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for i in sorted(range(len(texts)), key=token_counts.__getitem__):
+            if current and (
+                current_tokens + token_counts[i] > self.max_batch_tokens
+                or len(current) >= self.batch_size
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += token_counts[i]
+        if current:
+            batches.append(current)
+
+        results = await asyncio.gather(*[
+            self._embed_batch([texts[i] for i in batch])
+            for batch in batches
+        ])
+
+        # Scatter batch rows back into input order
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for batch, batch_embeddings in zip(batches, results):
+            embeddings[batch] = batch_embeddings
+
+        return embeddings
+
+    @retry_openai
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed a single sub-batch of texts with retry and bounded concurrency."""
+        async with self._semaphore:
+            response = await self.client.embeddings.create(
+                model=self.model,
+                input=texts,
+                dimensions=self.dimension
+            )
+            return self._to_array([data.embedding for data in response.data])
+
+    def _to_array(self, embeddings: List[List[float]]) -> np.ndarray:
+        """
+        Pack raw API embeddings into a contiguous, L2-normalized float32 array.
+
+        Normalizing once here lets downstream cosine similarity reduce to a
+        plain dot product, and float32 storage is ~7x smaller than lists of
+        Python floats.
         """
-        for attempt in range(max_retries):
-            try:
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=texts,
-                    dimensions=self.dimension
-                )
-                return [data.embedding for data in response.data]
-
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    print(f"Batch embedding API error (attempt {attempt + 1}/{max_retries}): {e}")
-                    print(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    raise Exception(f"Failed to generate embeddings after {max_retries} attempts: {e}")
+        array = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(array, axis=1, keepdims=True)
+        np.divide(array, norms, out=array, where=norms > 0)
+        return array
@@ -1,77 +1,226 @@
-import time
-from typing import List, Dict, Any
-from openai import OpenAI
+import hashlib
+from typing import ClassVar, List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from openai import AsyncOpenAI
 from config.settings import settings
+from services._http import http_client
+from services._retry import retry_openai
 
 
 class LLMService:
     """Service for generating responses using OpenAI LLM."""
 
+    # Semantic cache tuning: max retained responses and the minimum cosine
+    # similarity between query embeddings for a lookup to count as a hit
+    cache_max_entries: int = 1024
+    cache_similarity_threshold: float = 0.95
+
+    # Built once; byte-identical across requests so OpenAI's prompt cache
+    # can reuse the full system-prompt prefix
+    SYSTEM_PROMPT: ClassVar[str] = """You are a helpful AI assistant that answers questions based on the provided context.
+
+Your responsibilities:
+1. Answer questions accurately using the context provided
+2. If the context doesn't contain enough information to answer the question, say so clearly
+3. Be concise and direct in your responses
+4. Cite specific parts of the context when relevant
+5. If the question is unclear, ask for clarification
+
+Important guidelines:
+- Only use information from the provided context
+- Do not make up or infer information not present in the context
+- If multiple pieces of context conflict, acknowledge the discrepancy
+- Be honest about limitations in the available information"""
+
+    # Static framing of the user prompt; only the context body and query
+    # are formatted per call
+    _NO_CONTEXT_TEMPLATE: ClassVar[str] = (
+        "Context: No relevant context found.\n\n"
+        "Please answer the question or indicate that you don't have enough "
+        "information to provide a meaningful answer.\n\n"
+        "Question: "
+    )
+    _CONTEXT_HEADER: ClassVar[str] = "Context Information:\n"
+    _CONTEXT_FOOTER: ClassVar[str] = (
+        "\n\nPlease answer the question based on the context provided above. "
+        "If the context doesn't contain relevant information, please indicate "
+        "that.\n\n"
+        "Question: "
+    )
+
     def __init__(self):
         """Initialize the OpenAI client."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=http_client
+        )
         self.model = settings.llm_model
+        # GPT-5 doesn't support a configurable temperature parameter and has
+        # no upper bound on visible output and reasoning tokens, unlike older
+        # models; resolve that once here instead of branching per request
+        self._is_gpt5 = "gpt-5" in self.model
+        self._fixed_temperature = 1 if self._is_gpt5 else None
+        self._default_max_tokens = None if self._is_gpt5 else settings.max_response_tokens
+        # Constant leading message, reused across requests
+        self._system_message = {"role": "developer", "content": self.SYSTEM_PROMPT}
+        # Semantic response cache: (query embedding, context hash, response),
+        # ordered least- to most-recently used
+        self._cache: List[Tuple[np.ndarray, bytes, str]] = []
 
-    def generate_response(
+    @retry_openai
+    async def generate_response(
         self,
         query: str,
         context: List[str],
         temperature: float = None,
-        max_retries: int = 3,
-        retry_delay: float = 1.0
+        query_embedding: Optional[np.ndarray] = None
     ) -> str:
         """
         Generate a response using the LLM with provided context.
 
+        Transient API errors (rate limits, connection failures, timeouts)
+        are retried with jittered exponential backoff.
+
         Args:
             query: The user's question
             context: List of relevant context strings from vector search
             temperature: Sampling temperature (uses settings default if None)
-            max_retries: Maximum number of retry attempts
-            retry_delay: Initial delay between retries (exponential backoff)
+            query_embedding: Embedding of the query (float32 array or list),
+                if already computed upstream; enables the semantic response
+                cache
 
         Returns:
             Generated response string
 
         Raises:
-            Exception: If all retry attempts fail
+            openai.OpenAIError: If the request fails after all retries
         """
-        if temperature is None:
+        # Check the semantic cache before paying for an LLM call
+        query_vector = None
+        context_hash = None
+        if query_embedding is not None:
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            norm = np.linalg.norm(query_vector)
+            if norm > 0:
+                query_vector = query_vector / norm
+            context_hash = hashlib.md5("".join(context).encode()).digest()
+            cached_response = self._lookup_cached_response(query_vector, context_hash)
+            if cached_response is not None:
+                return cached_response
+
+        if self._is_gpt5:
+            temperature = self._fixed_temperature
+        elif temperature is None:
             temperature = settings.llm_temperature
 
-        max_tokens = settings.max_response_tokens
+        max_tokens = self._default_max_tokens
 
-        # GPT-5 doesn't support a configurable temperature parameter, unlike older models
-        if "gpt-5" in self.model:
-            temperature = 1
-            max_tokens = None  # remove upper bound for visible output tokens and reasoning tokens in GPT-5 model
+        # Construct the prompt with context
+        user_prompt = self._create_user_prompt(query, context)
+
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                self._system_message,
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            max_completion_tokens=max_tokens
+        )
+
+        response_text = response.choices[0].message.content
+
+        if query_vector is not None:
+            self._store_cached_response(query_vector, context_hash, response_text)
+
+        return response_text
+
+    async def generate_response_stream(
+        self,
+        query: str,
+        context: List[str],
+        temperature: float = None
+    ):
+        """
+        Stream a response from the LLM with provided context.
+
+        Args:
+            query: The user's question
+            context: List of relevant context strings from vector search
+            temperature: Sampling temperature (uses settings default if None)
+
+        Yields:
+            Response text fragments as they arrive from the API
+        """
+        if self._is_gpt5:
+            temperature = self._fixed_temperature
+        elif temperature is None:
+            temperature = settings.llm_temperature
+
+        max_tokens = self._default_max_tokens
 
         # Construct the prompt with context
-        system_prompt = self._create_system_prompt()
         user_prompt = self._create_user_prompt(query, context)
 
-        for attempt in range(max_retries):
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "developer", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=temperature,
-                    max_completion_tokens=max_tokens
-                )
-
-                return response.choices[0].message.content
-
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    print(f"LLM API error (attempt {attempt + 1}/{max_retries}): {e}")
-                    print(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    raise Exception(f"Failed to generate response after {max_retries} attempts: {e}")
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                self._system_message,
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            max_completion_tokens=max_tokens,
+            stream=True
+        )
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _lookup_cached_response(
+        self,
+        query_vector: np.ndarray,
+        context_hash: bytes
+    ) -> Optional[str]:
+        """
+        Look up a cached response for a semantically similar query.
+
+        Args:
+            query_vector: L2-normalized query embedding
+            context_hash: Hash of the retrieval context used for the query
+
+        Returns:
+            Cached response string, or None on a cache miss
+        """
+        if not self._cache:
+            return None
+
+        # Single vectorized cosine-similarity scan over all cached embeddings
+        cache_matrix = np.stack([entry[0] for entry in self._cache])
+        similarities = cache_matrix @ query_vector
+        best = int(similarities.argmax())
+
+        # The context hash guards against returning an answer that was
+        # generated from different retrieved context
+        if (similarities[best] > self.cache_similarity_threshold
+                and self._cache[best][1] == context_hash):
+            # Refresh LRU position
+            self._cache.append(self._cache.pop(best))
+            return self._cache[-1][2]
+
+        return None
+
+    def _store_cached_response(
+        self,
+        query_vector: np.ndarray,
+        context_hash: bytes,
+        response: str
+    ) -> None:
+        """Store a response in the semantic cache, evicting the LRU entry if full."""
+        if len(self._cache) >= self.cache_max_entries:
+            self._cache.pop(0)
+        self._cache.append((query_vector, context_hash, response))
 
     def _create_system_prompt(self) -> str:
         """
@@ -80,25 +229,16 @@ class LLMService:
         Returns:
             System prompt string
         """
-        return """You are a helpful AI assistant that answers questions based on the provided context.
-
-Your responsibilities:
-1. Answer questions accurately using the context provided
-2. If the context doesn't contain enough information to answer the question, say so clearly
-3. Be concise and direct in your responses
-4. Cite specific parts of the context when relevant
-5. If the question is unclear, ask for clarification
-
-Important guidelines:
-- Only use information from the provided context
-- Do not make up or infer information not present in the context
-- If multiple pieces of context conflict, acknowledge the discrepancy
-- Be honest about limitations in the available information"""
+        return self.SYSTEM_PROMPT
 
     def _create_user_prompt(self, query: str, context: List[str]) -> str:
         """
         Create the user prompt with context and query.
 
+        The context block comes first in a deterministic order and the query
+        comes last, so the longest shared prefix across requests stays
+        byte-identical and eligible for OpenAI's prompt caching.
+
         Args:
             query: The user's question
             context: List of context strings
@@ -107,32 +247,22 @@ Important guidelines:
             Formatted user prompt
         """
         if not context:
-            return f"""Question: {query}
-
-Context: No relevant context found.
+            return self._NO_CONTEXT_TEMPLATE + query
 
-Please answer the question or indicate that you don't have enough information to provide a meaningful answer."""
-
-        # Format context with numbering
-        formatted_context = "\n\n".join([
+        # Sort by content rather than retrieval score so the context token
+        # order only changes when the retrieved content itself changes
+        formatted_context = "\n\n".join(
             f"Context {i+1}:\n{ctx}"
-            for i, ctx in enumerate(context)
-        ])
-
-        return f"""Context Information:
-{formatted_context}
-
-Question: {query}
+            for i, ctx in enumerate(sorted(context))
+        )
 
-Please answer the question based on the context provided above. If the context doesn't contain relevant information, please indicate that."""
+        return f"{self._CONTEXT_HEADER}{formatted_context}{self._CONTEXT_FOOTER}{query}"
 
-    def generate_response_with_metadata(
+    async def generate_response_with_metadata(
         self,
         query: str,
         sources: List[Dict[str, Any]],
-        temperature: float = None,
-        max_retries: int = 3,
-        retry_delay: float = 1.0
+        temperature: float = None
     ) -> str:
         """
         Generate a response using sources with metadata.
@@ -141,22 +271,18 @@ Please answer the question based on the context provided above. If the context d
             query: The user's question
             sources: List of source dictionaries with 'content' and 'metadata'
             temperature: Sampling temperature (uses settings default if None)
-            max_retries: Maximum number of retry attempts
-            retry_delay: Initial delay between retries
 
         Returns:
             Generated response string
 
         Raises:
-            Exception: If all retry attempts fail
+            openai.OpenAIError: If the request fails after all retries
         """
         # Extract just the content for context
         context = [source.get("content", "") for source in sources if source.get("content")]
 
-        return self.generate_response(
+        return await self.generate_response(
             query=query,
             context=context,
-            temperature=temperature,
-            max_retries=max_retries,
-            retry_delay=retry_delay
+            temperature=temperature
         )
@@ -1,8 +1,180 @@
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
 from pinecone import Pinecone, ServerlessSpec
 from config.settings import settings
 
+logger = logging.getLogger(__name__)
+
+
+# Metadata keys surfaced as dedicated result fields rather than passed
+# through in the metadata dict
+_EXCLUDED_METADATA_KEYS = frozenset({"source", "text"})
+
+
+def _chunks(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield successive lists of up to `size` items from `iterable`."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class QueryCache:
+    """
+    In-process semantic cache for vector search results.
+
+    Caches formatted search results keyed by the query embedding; a lookup
+    hits when a cached query's cosine similarity exceeds the threshold and
+    its top_k and filter match. Entries expire after a TTL and the cache is
+    invalidated entirely whenever the index contents change.
+
+    Embeddings live in one preallocated, unit-normalized float16 matrix
+    written as a ring buffer, so a lookup is a single (N, D) @ (D,) BLAS
+    call over memory that fits in L2 (1024 x 1024 x 2 bytes = 2 MB) instead
+    of a Python-level loop, and stale slots are simply overwritten.
+
+    Once the cache is larger than `rerank_candidates`, lookups run a
+    binary-quantized first stage: the sign bits of each embedding are
+    packed into uint64 words (32x smaller than fp16), candidates are culled
+    by Hamming distance via vectorized popcount, and only the survivors pay
+    for an exact fp16 dot product.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        similarity_threshold: float = 0.97,
+        rerank_candidates: int = 32
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.rerank_candidates = rerank_candidates
+        self._lock = threading.RLock()
+        # Embedding matrix, allocated on first put once the dimension is known
+        self._matrix: Optional[np.ndarray] = None
+        # Packed sign bits of each row, (max_entries, ceil(dim / 64)) uint64
+        self._bits: Optional[np.ndarray] = None
+        # Per-slot (top_k, filter key, expiry timestamp, results)
+        self._meta: List[Optional[Tuple[int, str, float, List[Dict[str, Any]]]]] = []
+        self._cursor = 0   # next slot to write
+        self._count = 0    # filled slots
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _normalize(embedding: Union[np.ndarray, List[float]]) -> np.ndarray:
+        """Convert an embedding into a unit-norm float32 vector."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    @staticmethod
+    def _pack_sign_bits(vector: np.ndarray) -> np.ndarray:
+        """Pack the sign bits of a vector into uint64 words."""
+        bits = np.packbits(vector > 0, bitorder="little")
+        if bits.size % 8:
+            # Pad so the byte view aligns to whole uint64 words
+            bits = np.pad(bits, (0, 8 - bits.size % 8))
+        return bits.view(np.uint64)
+
+    def get(
+        self,
+        query_embedding: Union[np.ndarray, List[float]],
+        top_k: int,
+        filter: Optional[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results for a semantically equivalent query, or None."""
+        query_vector = self._normalize(query_embedding).astype(np.float16)
+        filter_key = repr(filter)
+        now = time.time()
+
+        with self._lock:
+            if self._count == 0:
+                self._misses += 1
+                return None
+
+            if self._count > self.rerank_candidates:
+                # Binary first stage: Hamming distance over packed sign
+                # bits (vectorized popcount, 32x less memory traffic than
+                # fp16) culls the scan to a handful of candidates that are
+                # reranked with exact scores
+                query_bits = self._pack_sign_bits(query_vector)
+                hamming = np.bitwise_count(
+                    self._bits[:self._count] ^ query_bits
+                ).sum(axis=1)
+                candidates = np.argpartition(
+                    hamming, self.rerank_candidates - 1
+                )[:self.rerank_candidates]
+                scores = self._matrix[candidates] @ query_vector
+            else:
+                # Small cache: one exact scan is already cheap
+                candidates = None
+                scores = self._matrix[:self._count] @ query_vector
+
+            for pos in np.argsort(scores)[::-1]:
+                if scores[pos] < self.similarity_threshold:
+                    break
+                idx = int(candidates[pos]) if candidates is not None else pos
+                entry_top_k, entry_filter_key, expiry, results = self._meta[idx]
+                if expiry > now and entry_top_k == top_k and entry_filter_key == filter_key:
+                    self._hits += 1
+                    return results
+
+            self._misses += 1
+            return None
+
+    def put(
+        self,
+        query_embedding: Union[np.ndarray, List[float]],
+        top_k: int,
+        filter: Optional[Dict[str, Any]],
+        results: List[Dict[str, Any]]
+    ) -> None:
+        """Cache the results of a query, overwriting the oldest slot when full."""
+        query_vector = self._normalize(query_embedding).astype(np.float16)
+        expiry = time.time() + self.ttl_seconds
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros(
+                    (self.max_entries, query_vector.shape[0]), dtype=np.float16
+                )
+                words = self._pack_sign_bits(query_vector).shape[0]
+                self._bits = np.zeros((self.max_entries, words), dtype=np.uint64)
+                self._meta = [None] * self.max_entries
+
+            self._matrix[self._cursor] = query_vector
+            self._bits[self._cursor] = self._pack_sign_bits(query_vector)
+            self._meta[self._cursor] = (top_k, repr(filter), expiry, results)
+            self._cursor = (self._cursor + 1) % self.max_entries
+            self._count = min(self._count + 1, self.max_entries)
+
+    def clear(self) -> None:
+        """Invalidate all entries (call when index contents change)."""
+        with self._lock:
+            self._cursor = 0
+            self._count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size for monitoring."""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": self._count,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0
+            }
+
 
 class VectorDBService:
     """Service for managing vector database operations with Pinecone."""
@@ -13,48 +185,68 @@ class VectorDBService:
         self.index_name = settings.pinecone_index_name
         self.namespace = settings.pinecone_namespace
         self.index = None
+        self._init_lock = threading.Lock()
+        self._query_cache = QueryCache()
 
     def initialize_index(self, dimension: int = 1024) -> None:
         """
         Initialize or connect to a Pinecone index.
 
+        Idempotent and thread-safe: once connected, further calls return
+        immediately, and concurrent first calls are serialized so only one
+        performs the list/create round-trips (avoiding duplicate
+        create_index attempts and their 409s).
+
         Args:
             dimension: Dimension of the embedding vectors (default 1536 for text-embedding-3-small)
 
         Raises:
             Exception: If index creation or connection fails
         """
+        if self.index is not None:
+            return
+
+        with self._init_lock:
+            if self.index is not None:
+                return
+            self._initialize_index_locked(dimension)
+
+    def _initialize_index_locked(self, dimension: int) -> None:
+        """Create/connect to the index; caller holds the init lock."""
         try:
             # Check if index already exists
             existing_indexes = self.pc.list_indexes()
             index_names = [idx.name for idx in existing_indexes]
 
             if self.index_name not in index_names:
-                print(f"Creating new Pinecone index: {self.index_name}")
-                # Create new index with serverless spec
+                logger.info("Creating new Pinecone index: %s", self.index_name)
+                # Create new index with serverless spec. Vectors are
+                # unit-normalized client-side (see upsert_documents/search),
+                # so dot product equals cosine similarity while letting
+                # Pinecone skip its per-query and per-vector normalization.
                 self.pc.create_index(
                     name=self.index_name,
                     dimension=dimension,
-                    metric="cosine",
+                    metric="dotproduct",
                     spec=ServerlessSpec(
                         cloud="aws",
                         region="us-east-1"
                     )
                 )
-                print(f"Index '{self.index_name}' created successfully")
+                logger.info("Index '%s' created successfully", self.index_name)
             else:
-                print(f"Connecting to existing index: {self.index_name}")
+                logger.info("Connecting to existing index: %s", self.index_name)
 
-            # Connect to the index
-            self.index = self.pc.Index(self.index_name)
-            print(f"Connected to Pinecone index: {self.index_name}")
+            # Connect to the index with a thread pool for parallel requests
+            self.index = self.pc.Index(self.index_name, pool_threads=30)
+            logger.info("Connected to Pinecone index: %s", self.index_name)
 
         except Exception as e:
             raise Exception(f"Failed to initialize Pinecone index: {e}")
 
     def search(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int = 5,
         filter: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
@@ -62,7 +254,7 @@ class VectorDBService:
         Search for similar vectors in the index.
 
         Args:
-            query_embedding: The query vector
+            query_embedding: The query vector (float32 array or list)
             top_k: Number of results to return
             filter: Optional metadata filter
 
@@ -75,48 +267,150 @@ class VectorDBService:
         if self.index is None:
             raise Exception("Index not initialized. Call initialize_index() first.")
 
+        # The dotproduct index stores unit vectors, so queries must be
+        # unit-norm too for scores to remain cosine similarities
+        query_vector = QueryCache._normalize(query_embedding)
+
+        # Serve repeat and near-duplicate queries from the semantic cache
+        cached_results = self._query_cache.get(query_vector, top_k, filter)
+        if cached_results is not None:
+            return cached_results
+
         try:
             results = self.index.query(
                 namespace=self.namespace,
-                vector=query_embedding,
+                # The Pinecone client expects a plain list at the wire boundary
+                vector=query_vector.tolist(),
                 top_k=top_k,
                 include_metadata=True,
                 include_values=False,
                 filter=filter
             )
 
-            # Format results
-            formatted_results = []
-            for match in results.matches:
-                simple_metadata = match.metadata.copy()
-                simple_metadata["filename"] = Path(simple_metadata.get("source", "")).name
-                del simple_metadata["source"]
-                del simple_metadata["text"]
-                formatted_results.append({
-                    "id": match.id,
-                    "score": match.score,
-                    # "content": match.metadata.get("content", ""),
-                    "content": match.metadata.get("text", ""),
-                    "metadata": simple_metadata
-                })
+            formatted_results = self._format_matches(results.matches)
+
+            self._query_cache.put(query_vector, top_k, filter, formatted_results)
 
             return formatted_results
 
         except Exception as e:
             raise Exception(f"Vector search failed: {e}")
 
+    @staticmethod
+    def _format_matches(matches: List[Any]) -> List[Dict[str, Any]]:
+        """Format raw Pinecone matches into result dictionaries."""
+        formatted_results = []
+        for match in matches:
+            metadata = match.metadata
+            # One pass that skips the surfaced keys, instead of copying
+            # the full dict and deleting them afterwards
+            simple_metadata = {
+                key: value for key, value in metadata.items()
+                if key not in _EXCLUDED_METADATA_KEYS
+            }
+            # Take the basename with plain string scans; constructing a
+            # pathlib.PurePath per match is far more expensive
+            source = metadata.get("source", "")
+            simple_metadata["filename"] = source[
+                max(source.rfind("/"), source.rfind("\\")) + 1:
+            ]
+            formatted_results.append({
+                "id": match.id,
+                "score": match.score,
+                # "content": metadata.get("content", ""),
+                "content": metadata.get("text", ""),
+                "metadata": simple_metadata
+            })
+
+        return formatted_results
+
+    def batch_search(
+        self,
+        query_embeddings: List[Union[np.ndarray, List[float]]],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for similar vectors for several queries at once.
+
+        Multi-query retrieval (query expansion, HyDE) would otherwise pay
+        one sequential round-trip per query. Each query first consults the
+        in-process semantic cache; only the misses are dispatched, in
+        parallel on the index's thread pool, and their results are cached
+        on the way out.
+
+        Args:
+            query_embeddings: Query vectors (float32 arrays or lists)
+            top_k: Number of results to return per query
+            filter: Optional metadata filter applied to every query
+
+        Returns:
+            One result list per query, in input order
+
+        Raises:
+            Exception: If index is not initialized or any search fails
+        """
+        if self.index is None:
+            raise Exception("Index not initialized. Call initialize_index() first.")
+
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(query_embeddings)
+        misses: List[Tuple[int, np.ndarray]] = []
+
+        for i, query_embedding in enumerate(query_embeddings):
+            query_vector = QueryCache._normalize(query_embedding)
+            cached_results = self._query_cache.get(query_vector, top_k, filter)
+            if cached_results is not None:
+                results[i] = cached_results
+            else:
+                misses.append((i, query_vector))
+
+        try:
+            # Fire all cache misses before collecting any response so the
+            # round-trips overlap on the index's thread pool
+            pending = [
+                (i, query_vector, self.index.query(
+                    namespace=self.namespace,
+                    vector=query_vector.tolist(),
+                    top_k=top_k,
+                    include_metadata=True,
+                    include_values=False,
+                    filter=filter,
+                    async_req=True
+                ))
+                for i, query_vector in misses
+            ]
+
+            for i, query_vector, async_result in pending:
+                formatted_results = self._format_matches(async_result.get().matches)
+                self._query_cache.put(query_vector, top_k, filter, formatted_results)
+                results[i] = formatted_results
+
+            return results
+
+        except Exception as e:
+            raise Exception(f"Batch vector search failed: {e}")
+
     def upsert_documents(
         self,
-        documents: List[Dict[str, Any]]
+        documents: Iterable[Dict[str, Any]],
+        batch_size: int = 100,
+        document_chunk_size: int = 1000
     ) -> int:
         """
         Upsert documents with their embeddings to the index.
 
+        Accepts any iterable and consumes it in streaming fashion, so a
+        lazy producer (e.g. utils.helpers.iter_prepared_documents) is never
+        fully materialized; peak memory is one document chunk.
+
         Args:
-            documents: List of documents, each containing:
+            documents: Iterable of documents, each containing:
                 - id: Unique identifier
                 - embedding: Vector embedding
                 - metadata: Dictionary of metadata (must include 'content')
+            batch_size: Vectors sent per upsert request
+            document_chunk_size: Documents formatted and kept in flight at a
+                time; bounds peak memory on very large ingests
 
         Returns:
             Number of documents upserted
@@ -128,25 +422,58 @@ class VectorDBService:
             raise Exception("Index not initialized. Call initialize_index() first.")
 
         try:
-            # Format documents for Pinecone
-            vectors = []
-            for doc in documents:
-                vectors.append({
-                    "id": doc["id"],
-                    "values": doc["embedding"],
-                    "metadata": doc["metadata"]
-                })
-
-            # Upsert in batches of 100
-            batch_size = 100
+            # Process one outer chunk of documents at a time: fire its
+            # batches in parallel on the index's thread pool, then join
+            # before touching the next chunk. Upserts are network-bound so
+            # the round-trips overlap, while peak memory stays bounded by
+            # document_chunk_size formatted vectors.
             total_upserted = 0
 
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-                self.index.upsert(vectors=batch)
-                total_upserted += len(batch)
-
-            print(f"Successfully upserted {total_upserted} documents to Pinecone")
+            for document_chunk in _chunks(documents, document_chunk_size):
+                # Repack the chunk into struct-of-arrays form: one
+                # contiguous float32 matrix plus parallel id/metadata
+                # lists. Each batch payload then comes from a single
+                # C-level tolist() on a row slice instead of per-vector
+                # dict traversal and Python-float boxing.
+                embeddings = np.asarray(
+                    [doc["embedding"] for doc in document_chunk],
+                    dtype=np.float32
+                )
+                # Store unit vectors so the dotproduct metric scores as
+                # cosine without Pinecone normalizing per vector
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+                ids = [doc["id"] for doc in document_chunk]
+                metadatas = [doc["metadata"] for doc in document_chunk]
+
+                async_results = []
+                for batch_start in range(0, len(ids), batch_size):
+                    batch_end = batch_start + batch_size
+                    batch = [
+                        {"id": doc_id, "values": values, "metadata": metadata}
+                        for doc_id, values, metadata in zip(
+                            ids[batch_start:batch_end],
+                            embeddings[batch_start:batch_end].tolist(),
+                            metadatas[batch_start:batch_end]
+                        )
+                    ]
+                    async_results.append(self.index.upsert(
+                        vectors=batch,
+                        namespace=self.namespace,
+                        async_req=True
+                    ))
+                    total_upserted += len(batch)
+
+                # Surface any per-batch errors
+                for result in async_results:
+                    result.get()
+
+            # Cached search results may now be stale
+            self._query_cache.clear()
+
+            # Hot path: lazy formatting, and debug level since the route
+            # already logs per-request indexing stats
+            logger.debug("Upserted %d documents to Pinecone", total_upserted)
             return total_upserted
 
         except Exception as e:
@@ -164,10 +491,20 @@ class VectorDBService:
 
         try:
             self.index.delete(delete_all=True)
-            print(f"All vectors deleted from index: {self.index_name}")
+            self._query_cache.clear()
+            logger.info("All vectors deleted from index: %s", self.index_name)
         except Exception as e:
             raise Exception(f"Failed to delete vectors: {e}")
 
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get query-cache statistics.
+
+        Returns:
+            Dictionary with entry count, hit/miss counters, and hit rate
+        """
+        return self._query_cache.stats()
+
     def get_stats(self) -> Dict[str, Any]:
         """
         Get index statistics.
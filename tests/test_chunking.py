@@ -0,0 +1,147 @@
+"""Tests for the chunking helpers in utils.helpers."""
+import random
+import string
+from typing import List
+
+import numpy as np
+
+from utils import _chunker
+from utils.helpers import chunk_text
+
+
+class ReferenceStalled(Exception):
+    """The original implementation did not terminate on this input."""
+
+
+def _reference_chunk_text(
+    text: str,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    max_windows: int = 100_000
+) -> List[str]:
+    """
+    Original rfind-based chunk_text, kept as the behavioral reference for
+    the optimized implementations. The only addition is a window cap:
+    the original never terminates for some adversarial parameter choices
+    (a break point that keeps the window from advancing), and the fuzz
+    test skips those inputs rather than comparing against a hang.
+    """
+    if not text or chunk_size <= 0:
+        return []
+
+    if len(text) <= chunk_size:
+        return [text]
+
+    chunks = []
+    start = 0
+    windows = 0
+
+    while start < len(text):
+        windows += 1
+        if windows > max_windows:
+            raise ReferenceStalled
+        end = start + chunk_size
+
+        if end < len(text):
+            sentence_end = max(
+                text.rfind('. ', start, end),
+                text.rfind('! ', start, end),
+                text.rfind('? ', start, end)
+            )
+
+            if sentence_end > start:
+                end = sentence_end + 1
+            else:
+                space_pos = text.rfind(' ', start, end)
+                if space_pos > start:
+                    end = space_pos
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        start = end - overlap if end < len(text) else len(text)
+
+    return chunks
+
+
+# The only break point in the first window (the space at index 199) sits
+# inside the overlap, so the next window start goes negative. str.rfind
+# counts a negative start from the end of the text and finds nothing, so
+# the reference advances past the window; a literal backward scan re-finds
+# the same space forever.
+BREAK_INSIDE_OVERLAP = "X" * 199 + " " + "B" * 2000 + ". The end."
+
+
+def test_break_inside_overlap_character_path():
+    # A non-ASCII character forces the per-character scan
+    text = "é" + BREAK_INSIDE_OVERLAP[1:]
+    assert chunk_text(text, 1000, 200) == _reference_chunk_text(text, 1000, 200)
+
+
+def test_break_inside_overlap_byte_path():
+    # ASCII text takes the bytes.rfind scan (or the kernel when numba is
+    # installed)
+    text = BREAK_INSIDE_OVERLAP
+    assert chunk_text(text, 1000, 200) == _reference_chunk_text(text, 1000, 200)
+
+
+def _kernel_chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """Run the _chunker kernel directly, bypassing the helpers dispatch."""
+    encoded = text.encode("ascii")
+    data = np.frombuffer(encoded, dtype=np.uint8)
+    padded = encoded + b"\x00" * (-len(encoded) % 8)
+    words = np.frombuffer(padded, dtype=np.uint64)
+    return [
+        text[int(s):int(e)]
+        for s, e in _chunker._chunk_offsets_impl(data, words, chunk_size, overlap)
+    ]
+
+
+def test_break_inside_overlap_kernel_path():
+    text = BREAK_INSIDE_OVERLAP
+    assert _kernel_chunk_text(text, 1000, 200) == _reference_chunk_text(text, 1000, 200)
+
+
+def test_fuzz_all_paths_match_reference():
+    """
+    Fuzz chunk_text (both string and byte scans) and the kernel against
+    the original implementation. Inputs where the original itself never
+    terminates are skipped; everything else must match exactly.
+    """
+    rng = random.Random(1234)
+    alphabet = string.ascii_letters + ".!? \t\n" + " " * 8 + "." * 3
+    compared = 0
+
+    for _ in range(800):
+        n = rng.randint(2, 500)
+        text = "".join(rng.choice(alphabet) for _ in range(n))
+        chunk_size = rng.randint(1, 80)
+        overlap = rng.randint(0, chunk_size - 1)
+
+        try:
+            expected = _reference_chunk_text(text, chunk_size, overlap, max_windows=5_000)
+        except ReferenceStalled:
+            continue
+
+        assert chunk_text(text, chunk_size, overlap) == expected
+
+        # Force the per-character scan with a non-ASCII prefix; the prefix
+        # can change where breaks fall, so re-derive (and re-vet) the
+        # expectation
+        unicode_text = "é" + text[1:]
+        try:
+            unicode_expected = _reference_chunk_text(
+                unicode_text, chunk_size, overlap, max_windows=5_000
+            )
+        except ReferenceStalled:
+            unicode_expected = None
+        if unicode_expected is not None:
+            assert chunk_text(unicode_text, chunk_size, overlap) == unicode_expected
+
+        # The kernel is only dispatched past the single-chunk short-circuit
+        if n > chunk_size:
+            assert _kernel_chunk_text(text, chunk_size, overlap) == expected
+        compared += 1
+
+    assert compared > 100
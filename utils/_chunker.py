@@ -0,0 +1,129 @@
+"""
+Optional JIT-compiled kernel for chunk offset computation.
+
+When numba is installed, `chunk_offsets` compiles to native code operating
+on the raw bytes of ASCII text, removing the interpreter overhead of the
+per-character scan in `utils.helpers`. The import is optional: callers
+check HAVE_NUMBA and fall back to the pure-Python path otherwise.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# SWAR masks for testing 8 bytes per step: a block contains a space iff
+# (block XOR _M_SPACE) has a zero byte. The zero-byte test below uses the
+# borrow-free formulation (x | HIGH) - LOW, which never underflows, so it
+# behaves identically for numba uint64 and plain Python ints.
+_M_SPACE = np.uint64(0x2020202020202020)
+_M_LOW = np.uint64(0x0101010101010101)
+_M_HIGH = np.uint64(0x8080808080808080)
+_M_ALL = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _chunk_offsets_impl(data, words, chunk_size, overlap):
+    """
+    Compute chunk (start, end) offsets over ASCII bytes.
+
+    Mirrors the boundary logic of utils.helpers.chunk_text_offsets: break
+    at the last sentence terminator followed by a space, falling back to
+    the last space, then strip whitespace by moving the offsets. The
+    boundary scan walks 8-byte blocks via `words` and only drops to a
+    byte-by-byte scan inside blocks that contain a space, so blocks of
+    ordinary word characters cost one mask test instead of eight compares.
+
+    Args:
+        data: uint8 array holding the ASCII-encoded text
+        words: little-endian uint64 view of the same bytes, zero-padded to
+            a whole number of words
+        chunk_size: Maximum chunk length in bytes
+        overlap: Bytes of overlap between consecutive chunks
+
+    Returns:
+        int64 array of shape (n_chunks, 2) with (start, end) per row
+    """
+    n = data.shape[0]
+    capacity = 16
+    out = np.empty((capacity, 2), dtype=np.int64)
+    count = 0
+    start = 0
+
+    while start < n:
+        end = start + chunk_size
+
+        if end < n:
+            # Reverse scan for a sentence boundary, recording the last
+            # plain space as the fallback. Whole 8-byte blocks without a
+            # space are skipped with one SWAR test each. Windows with a
+            # negative start (break inside the overlap) are not scanned,
+            # matching the helpers paths: rfind semantics found nothing
+            # there, and scanning literally would re-find the same break
+            # forever and read bytes from the end of the buffer.
+            if start >= 0:
+                found = -1
+                last_space = -1
+                lo = start + 1
+                block = (end - 1) >> 3
+                low_block = lo >> 3
+                while block >= low_block:
+                    x = words[block] ^ _M_SPACE
+                    y = (x | _M_HIGH) - _M_LOW
+                    if ((x ^ _M_ALL) & (y ^ _M_ALL) & _M_HIGH) != 0:
+                        # Block holds at least one space: scan its bytes
+                        # that fall inside the window, highest first
+                        block_hi = block * 8 + 7
+                        if block_hi > end - 1:
+                            block_hi = end - 1
+                        block_lo = block * 8
+                        if block_lo < lo:
+                            block_lo = lo
+                        for i in range(block_hi, block_lo - 1, -1):
+                            if data[i] == 32:  # ' '
+                                prev = data[i - 1]
+                                if i - 1 > start and (prev == 46 or prev == 33 or prev == 63):  # .!?
+                                    found = i
+                                    break
+                                if last_space < 0:
+                                    last_space = i
+                        if found >= 0:
+                            break
+                    block -= 1
+                if found >= 0:
+                    end = found
+                elif last_space > start:
+                    end = last_space
+        else:
+            end = n
+
+        # Strip ASCII whitespace (matching str.isspace for ASCII) by
+        # moving the offsets; negative-start windows emit nothing, like
+        # the empty slice they produced in the original implementation
+        if start >= 0:
+            s = start
+            e = end
+            while s < e and (data[s] == 32 or 9 <= data[s] <= 13 or 28 <= data[s] <= 31):
+                s += 1
+            while e > s and (data[e - 1] == 32 or 9 <= data[e - 1] <= 13 or 28 <= data[e - 1] <= 31):
+                e -= 1
+            if s < e:
+                if count == capacity:
+                    capacity *= 2
+                    grown = np.empty((capacity, 2), dtype=np.int64)
+                    grown[:count] = out[:count]
+                    out = grown
+                out[count, 0] = s
+                out[count, 1] = e
+                count += 1
+
+        start = end - overlap if end < n else n
+
+    return out[:count]
+
+
+if HAVE_NUMBA:
+    chunk_offsets = njit(cache=True)(_chunk_offsets_impl)
+else:
+    chunk_offsets = _chunk_offsets_impl
@@ -1,14 +1,109 @@
-from typing import List, Dict, Any
-import uuid
+from typing import Any, Dict, Iterator, List, Tuple
+import os
 
+import numpy as np
 
-def chunk_text(
+from utils import _chunker
+
+# Characters that end a sentence when followed by a space
+_SENTENCE_TERMINATORS = frozenset('.!?')
+_SENTENCE_TERMINATOR_BYTES = frozenset(b'.!?')
+
+
+def _find_break(text: str, start: int, end: int) -> int:
+    """
+    Find the best break position in text[start:end] with one reverse scan.
+
+    Prefers the last sentence terminator followed by a space, falling back
+    to the last space; both are found in the same pass instead of the four
+    separate rfind scans over the window this replaces.
+
+    Args:
+        text: The full text being chunked
+        start: Window start (inclusive)
+        end: Window end (exclusive)
+
+    Returns:
+        Exclusive end for the chunk, or `end` unchanged if no boundary exists
+    """
+    if start < 0:
+        # A break just past a window start pulls the next start negative
+        # (start = end - overlap). str.rfind counts a negative start from
+        # the end of the text, making the search window empty, so the
+        # original scan found nothing here; scanning range(end - 1, start,
+        # -1) literally would re-find the same break and stall the chunk
+        # loop forever. Mirror the rfind behavior.
+        return end
+
+    last_space = -1
+    for i in range(end - 1, start, -1):
+        if text[i] == ' ':
+            if i - 1 > start and text[i - 1] in _SENTENCE_TERMINATORS:
+                # Break right after the terminator
+                return i
+            if last_space < 0:
+                last_space = i
+
+    if last_space > start:
+        return last_space
+
+    return end
+
+
+def _find_break_bytes(data: bytes, start: int, end: int) -> int:
+    """
+    Byte-level variant of `_find_break` for ASCII text.
+
+    Hops backward between spaces with `bytes.rfind` (a C-level scan) and
+    only inspects the byte before each space, so the interpreter touches a
+    handful of positions per window instead of every character. Typical
+    prose hits a sentence terminator within a few spaces of the window end.
+
+    Args:
+        data: ASCII-encoded bytes of the full text
+        start: Window start (inclusive)
+        end: Window end (exclusive)
+
+    Returns:
+        Exclusive end for the chunk, or `end` unchanged if no boundary exists
+    """
+    if start < 0:
+        # Same progress guarantee as _find_break: a negative start (break
+        # inside the overlap) must find nothing, or rfind restarts from 0
+        # and re-finds the same space forever
+        return end
+
+    last_space = -1
+    pos = end
+    while True:
+        i = data.rfind(b' ', start + 1, pos)
+        if i < 0:
+            break
+        if i - 1 > start and data[i - 1] in _SENTENCE_TERMINATOR_BYTES:
+            # Break right after the terminator
+            return i
+        if last_space < 0:
+            last_space = i
+        pos = i
+
+    if last_space > start:
+        return last_space
+
+    return end
+
+
+def chunk_text_offsets(
     text: str,
     chunk_size: int = 1000,
     overlap: int = 200
-) -> List[str]:
+) -> List[Tuple[int, int]]:
     """
-    Split text into overlapping chunks.
+    Compute (start, end) offsets of overlapping chunks within a text.
+
+    Returns only offset pairs so callers can defer substring allocation
+    until a chunk string is actually needed, instead of copying every
+    chunk (roughly 2x the source bytes at the default overlap) up front.
+    Whitespace stripping is done by shrinking the offsets.
 
     Args:
         text: The text to chunk
@@ -16,47 +111,91 @@ def chunk_text(
         overlap: Number of characters to overlap between chunks
 
     Returns:
-        List of text chunks
+        List of (start, end) offset pairs into `text`
     """
     if not text or chunk_size <= 0:
         return []
 
-    if len(text) <= chunk_size:
-        return [text]
-
-    chunks = []
+    text_length = len(text)
+    if text_length <= chunk_size:
+        return [(0, text_length)]
+
+    # ASCII text is scanned at the byte level: via the compiled kernel when
+    # numba is available, otherwise with C-level rfind hops. Byte offsets
+    # equal character offsets only for ASCII, so everything else takes the
+    # per-character path.
+    if text.isascii():
+        encoded = text.encode("ascii")
+        if _chunker.HAVE_NUMBA:
+            data = np.frombuffer(encoded, dtype=np.uint8)
+            # uint64 view of the same bytes for the kernel's SWAR block
+            # skipping; zero padding is never a space so it can't match
+            padded = encoded + b"\x00" * (-len(encoded) % 8)
+            words = np.frombuffer(padded, dtype=np.uint64)
+            return [
+                (int(start), int(end))
+                for start, end in _chunker.chunk_offsets(
+                    data, words, chunk_size, overlap
+                )
+            ]
+    else:
+        encoded = None
+
+    offsets = []
     start = 0
 
-    while start < len(text):
+    while start < text_length:
         # Calculate end position
         end = start + chunk_size
 
         # If not the last chunk, try to break at a sentence or word boundary
-        if end < len(text):
-            # Look for sentence boundaries (. ! ?)
-            sentence_end = max(
-                text.rfind('. ', start, end),
-                text.rfind('! ', start, end),
-                text.rfind('? ', start, end)
-            )
-
-            if sentence_end > start:
-                end = sentence_end + 1
+        if end < text_length:
+            if encoded is not None:
+                end = _find_break_bytes(encoded, start, end)
             else:
-                # Look for word boundary (space)
-                space_pos = text.rfind(' ', start, end)
-                if space_pos > start:
-                    end = space_pos
-
-        # Extract chunk
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
+                end = _find_break(text, start, end)
+        else:
+            end = text_length
+
+        # Strip whitespace by moving the offsets, not by slicing. A
+        # negative start yields an empty slice (text[start:end] with
+        # text_length + start > end), so nothing is emitted for that
+        # window and the next one advances by chunk_size - overlap.
+        if start >= 0:
+            chunk_start, chunk_end = start, end
+            while chunk_start < chunk_end and text[chunk_start].isspace():
+                chunk_start += 1
+            while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            if chunk_start < chunk_end:
+                offsets.append((chunk_start, chunk_end))
 
         # Move start position, accounting for overlap
-        start = end - overlap if end < len(text) else len(text)
+        start = end - overlap if end < text_length else text_length
 
-    return chunks
+    return offsets
+
+
+def chunk_text(
+    text: str,
+    chunk_size: int = 1000,
+    overlap: int = 200
+) -> List[str]:
+    """
+    Split text into overlapping chunks.
+
+    Args:
+        text: The text to chunk
+        chunk_size: Maximum size of each chunk in characters
+        overlap: Number of characters to overlap between chunks
+
+    Returns:
+        List of text chunks
+    """
+    return [
+        text[start:end]
+        for start, end in chunk_text_offsets(text, chunk_size, overlap)
+    ]
 
 
 def format_context(sources: List[Dict[str, Any]]) -> List[str]:
@@ -88,17 +227,23 @@ def generate_document_id(prefix: str = "doc") -> str:
     Returns:
         Unique document ID string
     """
-    return f"{prefix}_{uuid.uuid4().hex[:12]}"
+    # 6 CSPRNG bytes hex-encoded; same 48 bits of entropy as the previous
+    # uuid4().hex[:12] without constructing a UUID object per chunk
+    return f"{prefix}_{os.urandom(6).hex()}"
 
 
-def prepare_documents_for_indexing(
+def iter_prepared_documents(
     contents: List[str],
     metadatas: List[Dict[str, Any]] = None,
     chunk_size: int = 1000,
     overlap: int = 200
-) -> List[Dict[str, Any]]:
+) -> Iterator[Dict[str, Any]]:
     """
-    Prepare documents for indexing by chunking and adding metadata.
+    Lazily prepare documents for indexing by chunking and adding metadata.
+
+    Yields one prepared chunk at a time so consumers that process in
+    batches (e.g. streaming upserts) hold O(batch) chunks in memory
+    instead of every chunk of every document at once.
 
     Args:
         contents: List of document contents
@@ -106,8 +251,8 @@ def prepare_documents_for_indexing(
         chunk_size: Size of each chunk in characters
         overlap: Overlap between chunks in characters
 
-    Returns:
-        List of prepared documents with id, content, and metadata
+    Yields:
+        Prepared documents with id, content, and metadata
     """
     if metadatas is None:
         metadatas = [{} for _ in contents]
@@ -115,30 +260,90 @@ def prepare_documents_for_indexing(
     if len(contents) != len(metadatas):
         raise ValueError("Number of contents and metadatas must match")
 
-    prepared_docs = []
-
     for doc_idx, (content, metadata) in enumerate(zip(contents, metadatas)):
-        # Chunk the content
-        chunks = chunk_text(content, chunk_size, overlap)
-
-        for chunk_idx, chunk in enumerate(chunks):
-            # Create metadata for this chunk
-            chunk_metadata = metadata.copy()
-            chunk_metadata["content"] = chunk
-            chunk_metadata["document_index"] = doc_idx
-            chunk_metadata["chunk_index"] = chunk_idx
-            chunk_metadata["total_chunks"] = len(chunks)
-
-            # Generate unique ID
-            doc_id = generate_document_id()
-
-            prepared_docs.append({
-                "id": doc_id,
+        # Chunk the content as offsets; each chunk string is materialized
+        # exactly once, below
+        offsets = chunk_text_offsets(content, chunk_size, overlap)
+        n_chunks = len(offsets)
+
+        for chunk_idx, (chunk_start, chunk_end) in enumerate(offsets):
+            chunk = content[chunk_start:chunk_end]
+
+            # Build the chunk metadata in one dict-merge instead of a copy
+            # followed by four inserts
+            chunk_metadata = {
+                **metadata,
+                "content": chunk,
+                "document_index": doc_idx,
+                "chunk_index": chunk_idx,
+                "total_chunks": n_chunks
+            }
+
+            yield {
+                "id": generate_document_id(),
                 "content": chunk,
                 "metadata": chunk_metadata
-            })
+            }
+
+
+def prepare_documents_for_indexing(
+    contents: List[str],
+    metadatas: List[Dict[str, Any]] = None,
+    chunk_size: int = 1000,
+    overlap: int = 200
+) -> List[Dict[str, Any]]:
+    """
+    Prepare documents for indexing by chunking and adding metadata.
+
+    Materializes the output of `iter_prepared_documents`; prefer the
+    iterator directly when the result is consumed in batches.
+
+    Args:
+        contents: List of document contents
+        metadatas: List of metadata dictionaries (one per document)
+        chunk_size: Size of each chunk in characters
+        overlap: Overlap between chunks in characters
+
+    Returns:
+        List of prepared documents with id, content, and metadata
+    """
+    return list(iter_prepared_documents(contents, metadatas, chunk_size, overlap))
+
+
+def validate_embedding(embedding: Any, expected_dim: int = 1024) -> np.ndarray:
+    """
+    Validate an embedding and return it as a float32 array.
+
+    Converts once to float32 and checks shape and finiteness, so a list of
+    strings or NaNs fails here rather than deep inside the Pinecone client,
+    and callers can reuse the returned array as the query/upsert payload
+    instead of converting again.
+
+    Args:
+        embedding: The embedding vector (list or array)
+        expected_dim: Expected dimension size
+
+    Returns:
+        float32 array of shape (expected_dim,)
+
+    Raises:
+        ValueError: If the embedding is non-numeric, has the wrong shape,
+            or contains NaN/infinite values
+    """
+    try:
+        array = np.asarray(embedding, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Embedding is not numeric: {e}")
+
+    if array.shape != (expected_dim,):
+        raise ValueError(
+            f"Embedding has shape {array.shape}, expected ({expected_dim},)"
+        )
+
+    if not np.isfinite(array).all():
+        raise ValueError("Embedding contains NaN or infinite values")
 
-    return prepared_docs
+    return array
 
 
 def validate_embedding_dimension(embedding: List[float], expected_dim: int = 1024) -> bool:
@@ -152,7 +357,11 @@ def validate_embedding_dimension(embedding: List[float], expected_dim: int = 102
     Returns:
         True if dimension matches, False otherwise
     """
-    return len(embedding) == expected_dim
+    try:
+        validate_embedding(embedding, expected_dim)
+    except ValueError:
+        return False
+    return True
 
 
 def truncate_text(text: str, max_length: int = 500) -> str:
@@ -169,4 +378,5 @@ def truncate_text(text: str, max_length: int = 500) -> str:
     if len(text) <= max_length:
         return text
 
-    return text[:max_length - 3] + "..."
+    # One f-string allocation instead of a slice plus a concat temporary
+    return f"{text[:max_length - 3]}..."